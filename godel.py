@@ -1,9 +1,17 @@
 import csv
-from typing import List
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, TextIO
 
 import click
 
-from scantron import Key, Scantron, Grader
+from scantron import Key, Scantron, ScantronGrade, Grader
+
+# large reads keep the csv tokenizer fed on big exports
+READ_BUFFER_SIZE = 1 << 20
+# rows handed to the worker pool at a time, and per task within that batch
+PARALLEL_BATCH_SIZE = 4096
+PARALLEL_CHUNK_SIZE = 64
 
 
 @click.group()
@@ -12,42 +20,88 @@ def cli():
 
 # TODO name argument
 @cli.command()
-@click.argument('file', type=click.File('r'), required=True)
+@click.argument('file', type=click.Path(exists=True, dir_okay=False, allow_dash=True), required=True)
 # output file is optional and defaults to stdout if not provided. can be provided with -o flag or --output flag and will overwrite the file if it already exists
 @click.option('-o', '--output', 'output', type=click.File('w'), default=None)
-def grade(file, output):
-    """Grade a scantron file."""
-    # read csv file
-    reader = csv.reader(file)
-
-    # separate keys and scantrons
-    keys: List[Key] = []
-    scantrons: List[Scantron] = []
-    for row in reader:
-        if row[1] == 'KEY' and row[2] == '':
-            keys.append(Key.parse(row))
+# parsing dominates grading time, so large files can parse and grade rows in several processes
+@click.option('-j', '--jobs', 'jobs', type=click.IntRange(min=1), default=1)
+def grade(file, output, jobs):
+    """Grade a scantron file.
+
+    FILE is a CSV path, or - to read the CSV from stdin.
+    """
+    with open_input(file) as f:
+        # keys are few, so collect them first and then stream the scantrons through the grader;
+        # input that cannot be reread (such as a piped stdin) is held in memory instead
+        if f.seekable():
+            keys: List[Key] = [Key.parse(row) for row in csv.reader(f) if is_key_row(row)]
+            f.seek(0)
+            all_rows = csv.reader(f)
         else:
-            scantrons.append(Scantron.parse(row))
+            all_rows = list(csv.reader(f))
+            keys = [Key.parse(row) for row in all_rows if is_key_row(row)]
+        grader = Grader(keys)
+
+        rows = (row for row in all_rows if not is_key_row(row))
+        if jobs == 1:
+            grades = (grader.grade(Scantron.parse(row)) for row in rows)
+        else:
+            grades = grade_rows_parallel(rows, grader.keys, jobs)
+        write_grades(grades, output)
+
+
+def open_input(file: str) -> TextIO:
+    """Opens FILE for csv reading, or stdin when FILE is '-'"""
+    if file == '-':
+        return click.open_file(file, 'r')
+    return open(file, newline='', buffering=READ_BUFFER_SIZE)
+
+
+def is_key_row(row: List[str]) -> bool:
+    return row[1] == 'KEY' and row[2] == ''
+
+
+# each worker process builds its own Grader once, see init_worker
+worker_grader: Optional[Grader] = None
 
-    # grade scantrons
-    grades = Grader(keys).grade_all(scantrons)
 
+def init_worker(keys: List[Key]):
+    global worker_grader
+    worker_grader = Grader(keys)
+
+
+def grade_row(row: List[str]) -> ScantronGrade:
+    return worker_grader.grade(Scantron.parse(row))
+
+
+def grade_rows_parallel(rows: Iterator[List[str]], keys: List[Key], jobs: int) -> Iterator[ScantronGrade]:
+    """Grades rows in worker processes, in order, reading at most PARALLEL_BATCH_SIZE rows ahead"""
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(keys,)) as executor:
+        while batch := list(islice(rows, PARALLEL_BATCH_SIZE)):
+            yield from executor.map(grade_row, batch, chunksize=PARALLEL_CHUNK_SIZE)
+
+
+def write_grades(grades: Iterable[ScantronGrade], output):
     if output is None:
         for grade in grades:
             click.echo(grade)
     else:
-        writer = csv.writer(output)
-        # iterate and unpack grades into name, id, and score
-        for grade in grades:
-            writer.writerow([
-                grade.student.name,
-                grade.student.sid,
-                'INVALID INFO' if not grade.student.is_valid else '',
-                grade.points,
-                grade.out_of,
-                round(100 * grade.points / grade.out_of, 2),
-                grade.form.value
-            ])
+        # unpack grades into name, id, and score
+        csv.writer(output).writerows(map(grade_columns, grades))
+
+
+def grade_columns(grade: ScantronGrade) -> list:
+    student, points, out_of = grade.student, grade.points, grade.out_of
+    return [
+        student.name,
+        student.sid,
+        'INVALID INFO' if not student.is_valid else '',
+        points,
+        out_of,
+        # a key of only extra credit questions is out of 0 points
+        round(100 * points / out_of, 2) if out_of else 0.,
+        grade.form.name
+    ]
 
 
 if __name__ == '__main__':
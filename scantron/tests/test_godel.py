@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+
+from click.testing import CliRunner
+
+from godel import cli
+
+ROWS = ['A,KEY,,3,A,PABC,2 PAB|CD',
+        'B,KEY,,3,B,C,D E',
+        'A,WANG   AY,12345678,3,A,"(1,2)",C',
+        'B,DOE JO,1234,3,B,C,A',
+        'A,ROE RI,87654321,3,B,ABC,CD']
+GRADES = ['WANG AY,12345678,,1.6666666666666665,4.0,41.67,A',
+          'DOE JO,1234,INVALID INFO,2.0,2.0,100.0,B',
+          'ROE RI,87654321,,3.0,4.0,75.0,A']
+
+
+def csv_text(rows):
+    return '\n'.join(rows) + '\n'
+
+
+class TestGrade(unittest.TestCase):
+    def setUp(self):
+        self.runner = CliRunner()
+
+    def grade_file(self, rows, *args):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'scantrons.csv')
+            with open(path, 'w') as f:
+                f.write(csv_text(rows))
+            return self.runner.invoke(cli, ['grade', path, '-o', '-', *args])
+
+    def test_file(self):
+        """Test that grades are written in input order"""
+        result = self.grade_file(ROWS)
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(result.output.splitlines(), GRADES)
+
+    def test_jobs(self):
+        """Test that grading in worker processes writes exactly the same output"""
+        rows = ROWS[:2] + ROWS[2:] * 50
+        single = self.grade_file(rows, '-j', '1')
+        parallel = self.grade_file(rows, '-j', '2')
+
+        self.assertEqual(parallel.exit_code, 0, parallel.output)
+        self.assertEqual(parallel.stdout_bytes, single.stdout_bytes)
+
+    def test_stdin_pipe(self):
+        """Test reading the CSV from a piped stdin, which cannot be reread"""
+        read_fd, write_fd = os.pipe()
+        with os.fdopen(write_fd, 'w') as pipe:
+            pipe.write(csv_text(ROWS))
+        with os.fdopen(read_fd, 'rb') as stdin:
+            result = self.runner.invoke(cli, ['grade', '-', '-o', '-'], input=stdin)
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(result.output.splitlines(), GRADES)
+
+    def test_extra_credit_key(self):
+        """Test that a key of only extra credit questions writes a 0.0 percentage"""
+        result = self.grade_file(['A,KEY,,1,A E',
+                                  'A,WANG AY,12345678,1,A'])
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(result.output.splitlines(), ['WANG AY,12345678,,1.0,0,0.0,A'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,6 @@
 import unittest
 
-from scantron.types import Student, Bubble, BUBBLES, Response, Scantron
+from scantron.types import Student, Bubble, BUBBLES, Response, Scantron, RubricItem, Key, ScantronGrade, Grader
 
 
 class TestStudent(unittest.TestCase):
@@ -50,6 +50,17 @@ class TestBubble(unittest.TestCase):
             self.assertEqual(Bubble.parse(digit), bubble,
                              f"'{digit}' should be parsed as {bubble}")
 
+    def test_str(self):
+        """Test that bubbles print by name rather than as ints"""
+        self.assertEqual(str(Bubble.A), "Bubble.A")
+        self.assertEqual(f"{Bubble.A}", "Bubble.A")
+
+    def test_parse_invalid(self):
+        """Test parsing of values that are not bubbles"""
+        for value in ['0', '6', 'F', 'a', '', 'AB']:
+            with self.assertRaises(ValueError, msg=f"'{value}' should not be parsed"):
+                Bubble.parse(value)
+
 
 class TestResponse(unittest.TestCase):
     def test_parse_multiple(self):
@@ -73,6 +84,24 @@ class TestResponse(unittest.TestCase):
                              Response(choices=BUBBLES).bubbles,
                              "Should sort bubbles")
 
+    def test_parse_duplicates(self):
+        """Test parsing of repeated bubbles"""
+        self.assertEqual(Response.parse('(3,1,3,1)').bubbles, (Bubble.A, Bubble.C),
+                         "Should remove duplicate bubbles")
+
+    def test_parse_separators(self):
+        """Test that any non-bubble character is ignored, including non-Latin-1 ones"""
+        self.assertEqual(Response.parse('A\u2013B'), Response(choices=[Bubble.A, Bubble.B]),
+                         "Should ignore an en dash separator")
+        self.assertEqual(Response.parse('\uff21').bubbles, (), "Should ignore a fullwidth letter")
+        self.assertEqual(Response.parse('(\uff13,1)'), Response(choices=[Bubble.A, Bubble.C]),
+                         "Should read a fullwidth digit as a bubble")
+
+    def test_parse_shared(self):
+        """Test that equal responses parse to one shared instance"""
+        self.assertIs(Response.parse('(5,3)'), Response.parse('CE'))
+        self.assertIsInstance(Response.parse('CE').bubbles, tuple, "Shared bubbles should be immutable")
+
 
 class TestScantron(unittest.TestCase):
     def test_parse(self):
@@ -101,5 +130,70 @@ class TestScantron(unittest.TestCase):
                          "Should parse row correctly")
 
 
+class TestRubricItem(unittest.TestCase):
+    def test_grade_exact(self):
+        """Test exact match grading"""
+        item = RubricItem.parse('AC')
+
+        self.assertEqual(item.grade(Response.parse('CA')), 1, "Same bubbles should get full credit")
+        self.assertEqual(item.grade(Response.parse('A')), 0, "Missing bubbles should get no credit")
+        self.assertEqual(item.grade(Response.parse('ACD')), 0, "Extra bubbles should get no credit")
+
+    def test_grade_partial(self):
+        """Test Canvas-style partial credit grading"""
+        item = RubricItem.parse('PABCD')
+        cases = {'ABCD': 1., 'ABC': .75, 'AB': .5, 'ABE': .25, 'AE': 0., 'E': 0., '': 0.}
+
+        for value, score in cases.items():
+            self.assertAlmostEqual(item.grade(Response.parse(value)), score,
+                                   msg=f"'{value}' should score {score}")
+
+    def test_parse_empty_partial(self):
+        """Test that a partial credit item without correct bubbles is rejected"""
+        with self.assertRaises(ValueError):
+            RubricItem.parse('P')
+
+    def test_parse_shared(self):
+        """Test that equivalent rubric items parse to one shared instance"""
+        self.assertIs(RubricItem.parse('PCAB'), RubricItem.parse('P(1,2,3)'))
+        self.assertIsNot(RubricItem.parse('ABC'), RubricItem.parse('PABC'))
+
+
+class TestGrader(unittest.TestCase):
+    def test_keys(self):
+        """Test that each Grader indexes only its own keys by form"""
+        key_a = Key.parse(['A', 'KEY', '', '2', 'A', 'B'])
+        key_b = Key.parse(['B', 'KEY', '', '2', 'C', 'D'])
+
+        self.assertEqual(Grader([key_a, key_b]).keys, [key_a, key_b])
+        self.assertEqual(Grader([key_b]).keys, [key_b], "Graders should not share keys")
+        with self.assertRaises(AssertionError, msg="Should reject multiple keys for one form"):
+            Grader([key_a, key_a])
+
+    def test_grade_all(self):
+        """Test that Grader's score tables agree with grading through the rubrics"""
+        grader = Grader([Key.parse(['A', 'KEY', '', '4', 'A', 'PABC', '2 PAB|CD', 'E E']),
+                         Key.parse(['B', 'KEY', '', '4', '0.5 BD', 'C', '(1,2)', 'PDE E'])])
+        responses = ['A', '(1,2)', 'C', '', 'ABCDE', 'BD', '(3,4)', 'DE', 'PE']
+        scantrons = [Scantron.parse([form, 'WANG AY', '12345678', '4', *responses[i:i + 4]])
+                     for i in range(len(responses) - 3)
+                     for form in 'BA']
+
+        expected = [ScantronGrade(scantron.student, scantron.form, *grader._find_key(scantron.form).grade(scantron))
+                    for scantron in scantrons]
+        self.assertEqual([grader.grade(scantron) for scantron in scantrons], expected,
+                         "Should grade like Key.grade")
+        self.assertEqual(grader.grade_all(scantrons), expected, "Should grade like Key.grade, in order")
+
+    def test_grade_all_mismatched(self):
+        """Test that batch grading rejects scantrons with the wrong number of responses"""
+        grader = Grader([Key.parse(['A', 'KEY', '', '2', 'A', 'B'])])
+        scantrons = [Scantron.parse(['A', 'WANG AY', '12345678', '2', 'A', 'B']),
+                     Scantron.parse(['A', 'WANG AY', '12345678', '1', 'A'])]
+
+        with self.assertRaises(AssertionError):
+            grader.grade_all(scantrons)
+
+
 if __name__ == '__main__':
     unittest.main()
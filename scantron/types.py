@@ -1,18 +1,40 @@
-import re
+import unicodedata
 from dataclasses import dataclass
-from enum import Enum
-from typing import Final, List, Pattern
+from enum import Enum, IntEnum
+from functools import reduce
+from operator import or_
+from typing import Dict, Final, FrozenSet, List, Optional, Tuple
 
-SID_REGEX: Final[Pattern] = re.compile(r"^\d{8}$")
+_RESP_KEEP: Final[frozenset] = frozenset('0123456789ABCDE')
+
+
+class _RespDeleteTable(dict):
+    """str.translate table that deletes every character it does not map,
+    except other scripts' decimal digits which are read as ASCII digits"""
+
+    def __missing__(self, key):
+        char = chr(key)
+        if char.isdecimal():
+            return str(unicodedata.decimal(char))
+        return None
+
+
+# deletes every character that cannot name a bubble, e.g. '(2,4,5)' -> '245'
+_RESP_DELETE_TABLE: Final[dict] = _RespDeleteTable({ord(c): ord(c) for c in _RESP_KEEP})
 
 
 class Student:
+    __slots__ = ('_name', '_sid', '_is_valid')
+
     _name: str
     _sid: str
+    _is_valid: bool
 
     def __init__(self, name: str, sid: str):
         self._name = " ".join(name.strip().split())
         self._sid = sid.strip() # remove leading/trailing whitespace
+        # SID must be exactly 8 digits
+        self._is_valid = len(self._name) > 0 and len(self._sid) == 8 and self._sid.isdecimal()
 
     @property
     def name(self):
@@ -24,7 +46,7 @@ class Student:
 
     @property
     def is_valid(self) -> bool:
-        return len(self.name) > 0 and SID_REGEX.match(self.sid) is not None
+        return self._is_valid
 
     def __eq__(self, other):
         return self.name == other.name and self.sid == other.sid
@@ -36,41 +58,61 @@ class Student:
         return f"Student(\"{self.name}\", \"{self.sid}\")"
 
 
-class Bubble(Enum):
-    A = 'A'
-    B = 'B'
-    C = 'C'
-    D = 'D'
-    E = 'E'
+class Bubble(IntEnum):
+    A = 0
+    B = 1
+    C = 2
+    D = 3
+    E = 4
+
+    # print as Bubble.A rather than as the bare int
+    __str__ = Enum.__str__
+
+    def __format__(self, format_spec):
+        return format(str(self), format_spec)
 
     @classmethod
     def parse(cls, value: str):
         try:
-            if value.isdigit():
-                return Bubble(chr(ord('A') + (int(value) - 1)))
-        except ValueError:
+            return _BUBBLE_MAP[value]
+        except KeyError:
             error_msg = f"Invalid bubble value: {value}"
-            raise ValueError(error_msg)
-        return Bubble(value)
+            raise ValueError(error_msg) from None
 
 
 BUBBLES = [Bubble.A, Bubble.B, Bubble.C, Bubble.D, Bubble.E]
 
+# accepts both letters and 1-based digits, e.g. 'B' and '2' are both Bubble.B
+_BUBBLE_MAP: Final[dict] = {
+    **{bubble.name: bubble for bubble in BUBBLES},
+    **{str(bubble + 1): bubble for bubble in BUBBLES},
+}
+
+# bit i of a response's bitmask is set iff Bubble i is selected
+_BUBBLE_BIT: Final[dict] = {bubble: 1 << bubble for bubble in BUBBLES}
+
 
 class Response:
-    _bubbles: List[Bubble]
+    __slots__ = ('_bubbles', '_bitmask', '_bubble_set')
+
+    _bubbles: Tuple[Bubble, ...]
+    _bitmask: int
+    _bubble_set: Optional[FrozenSet[Bubble]]
 
     def __init__(self, choices: List[Bubble]):
-        self._bubbles = sorted(choices, key=lambda b: b.value)
+        self._bitmask = reduce(or_, (1 << b for b in choices), 0)
+        # deduplicated and in BUBBLES order, read straight off the bitmask;
+        # a tuple, since parsed responses are shared
+        self._bubbles = tuple(bubble for bubble, bit in _BUBBLE_BIT.items() if self._bitmask & bit)
+        self._bubble_set = None  # built on first access, grading only needs the bitmask
 
     @classmethod
     def parse(cls, value: str):
-        return Response(
-            choices=list(set([
-                Bubble.parse(num)
-                for num in re.sub(r'[^\dA-E]', '', value)
-            ]))
-        )
+        # responses are immutable, so equal ones share the instance in _RESPONSES
+        bitmask = 0
+        for num in value.translate(_RESP_DELETE_TABLE):
+            bitmask |= 1 << Bubble.parse(num)
+        return _RESPONSES[bitmask]
 
     @property
     def bubbles(self):
@@ -78,10 +120,12 @@ class Response:
 
     @property
     def bubble_set(self):
-        return set(self.bubbles)
+        if self._bubble_set is None:
+            self._bubble_set = frozenset(self._bubbles)
+        return self._bubble_set
 
     def __eq__(self, other):
-        return self.bubbles == other.bubbles
+        return self._bitmask == other._bitmask
 
     def __str__(self):
         return ', '.join(map(str, self.bubbles))
@@ -90,7 +134,14 @@ class Response:
         return f"Response({self})"
 
 
+# every possible response, indexed by its bitmask
+_RESPONSES: Final[list] = [Response(choices=[bubble for bubble, bit in _BUBBLE_BIT.items() if mask & bit])
+                           for mask in range(1 << len(BUBBLES))]
+
+
 class Scantron:
+    __slots__ = ('_student', '_form', '_responses')
+
     _student: Student
     _form: Bubble
     _responses: List[Response]
@@ -129,7 +180,6 @@ class Scantron:
         return self._responses
 
     def __eq__(self, other):
-        print(self.student == other.student)
         return (self.student == other.student
                 and self.form == other.form
                 and self.responses == other.responses)
@@ -143,23 +193,37 @@ class Scantron:
 
 
 class RubricItem:
+    __slots__ = ('_correct_response', '_partial_credit', '_correct_mask', '_num_correct')
+
     _correct_response: Response
     _partial_credit: bool
+    _correct_mask: int
+    _num_correct: int
 
     def __init__(self, correct_response: Response, partial_credit: bool = False):
+        if partial_credit and not correct_response.bubbles:
+            raise ValueError("Partial credit rubric item must have at least one correct bubble")
         self._correct_response = correct_response
         self._partial_credit = partial_credit
+        self._correct_mask = correct_response._bitmask
+        self._num_correct = self._correct_mask.bit_count()
 
     @classmethod
     def parse(cls, value: str):
         """BNF: rubric_item ::= ['P'] response """
         is_partial = value.startswith('P')
         response_str = value[1:] if is_partial else value
-
-        return RubricItem(
-            correct_response=Response.parse(response_str),
-            partial_credit=is_partial
-        )
+        correct_response = Response.parse(response_str)
+
+        # RubricItems are immutable, so every key shares one instance per distinct item
+        cache_key = (is_partial, correct_response._bitmask)
+        item = _RUBRIC_ITEM_CACHE.get(cache_key)
+        if item is None:
+            item = _RUBRIC_ITEM_CACHE[cache_key] = RubricItem(
+                correct_response=correct_response,
+                partial_credit=is_partial
+            )
+        return item
 
     @property
     def correct_response(self):
@@ -171,14 +235,14 @@ class RubricItem:
 
     def grade(self, response: Response) -> float:
         """For partial credit, use Canvas scoring = clamp((SELECTED_CORRECT - SELECTED_WRONG) / |CORRECT|, [0, 1])"""
-        correct_bubbles = self.correct_response.bubble_set
-        response_bubbles = response.bubble_set
+        correct_bubbles = self._correct_mask
+        response_bubbles = response._bitmask
 
-        if self.partial_credit:
-            num_correct = len(correct_bubbles & response_bubbles)
-            num_wrong = len(response_bubbles - correct_bubbles)
+        if self._partial_credit:
+            num_correct = (correct_bubbles & response_bubbles).bit_count()
+            num_wrong = (response_bubbles & ~correct_bubbles).bit_count()
 
-            score = float(num_correct - num_wrong) / len(correct_bubbles)
+            score = float(num_correct - num_wrong) / self._num_correct
             return max(0, score)
 
         # exact match
@@ -195,15 +259,24 @@ class RubricItem:
         return f"RubricItem({self})"
 
 
+# parsed RubricItems by (partial_credit, correct bitmask), at most 64 entries
+_RUBRIC_ITEM_CACHE: Final[Dict[Tuple[bool, int], RubricItem]] = {}
+
+
 class Rubric:
+    __slots__ = ('_items', '_points', '_extra_credit', '_score_table')
+
     _items: List[RubricItem]
     _points: float
     _extra_credit: bool
+    _score_table: List[float]
 
     def __init__(self, rubric_items: List[RubricItem], points: float = 1., extra_credit: bool = False):
         self._items = rubric_items
         self._points = points
         self._extra_credit = extra_credit
+        # points earned by every possible response, indexed by its bitmask
+        self._score_table = [self.grade(response)[0] for response in _RESPONSES]
 
     @classmethod
     def parse(cls, value: str):
@@ -239,10 +312,11 @@ class Rubric:
     def grade(self, response: Response) -> (float, float):
         """Max score for all items.
         :returns: (points, out_of)"""
-        points_earned = self.points * max([item.grade(response) for item in self.items])
-        out_of = self.points if not self.extra_credit else 0
-
-        return points_earned, out_of
+        if len(self._items) == 1:
+            points_earned = self._points * self._items[0].grade(response)
+        else:
+            points_earned = self._points * max(item.grade(response) for item in self._items)
+        return points_earned, self.out_of
 
     @property
     def items(self):
@@ -256,6 +330,10 @@ class Rubric:
     def extra_credit(self):
         return self._extra_credit
 
+    @property
+    def out_of(self):
+        return self.points if not self.extra_credit else 0
+
     def __eq__(self, other):
         return (self.items == other.items
                 and self.points == other.points
@@ -269,12 +347,18 @@ class Rubric:
 
 
 class Key:
+    __slots__ = ('_form', '_questions', '_score_tables', '_out_of')
+
     _form: Bubble
     _questions: List[Rubric]
+    _score_tables: List[List[float]]
+    _out_of: float
 
     def __init__(self, form: Bubble, questions: List[Rubric]):
         self._form = form
         self._questions = questions
+        self._score_tables = [rubric._score_table for rubric in questions]
+        self._out_of = sum(rubric.out_of for rubric in questions)
 
     @classmethod
     def parse(cls, row: List[str]):
@@ -289,14 +373,27 @@ class Key:
         """:returns (points, out_of)"""
         assert scantron.form == self.form, \
             f"Cannot grade a Scantron with form {scantron.form} using Key with form {self.form}"
-        assert len(scantron.responses) == len(self.questions), \
-            f"Cannot grade a Scantron with {len(scantron.responses)} responses using Key with {len(self.questions)} questions"
-
-        scorings = [rubric.grade(response)
-                    for rubric, response in zip(self.questions, scantron.responses)]
-
-        # reduce: (p1, o1), (p2, o2) -> (p1 + p2, o1 + o2)
-        return tuple(map(sum, zip(*scorings)))
+        self._check_num_responses(scantron.responses)
+
+        points = out_of = 0
+        for rubric, response in zip(self._questions, scantron._responses):
+            rubric_points, rubric_out_of = rubric.grade(response)
+            points += rubric_points
+            out_of += rubric_out_of
+        return points, out_of
+
+    def _check_num_responses(self, responses: List[Response]):
+        assert len(responses) == len(self.questions), \
+            f"Cannot grade a Scantron with {len(responses)} responses using Key with {len(self.questions)} questions"
+
+    def _grade_unchecked(self, responses: List[Response]) -> (float, float):
+        """Same as grade, but only looks up each response in its rubric's score table.
+        The caller must check the responses with _check_num_responses first.
+        :returns (points, out_of)"""
+        points = 0
+        for table, response in zip(self._score_tables, responses):
+            points += table[response._bitmask]
+        return points, self._out_of
 
     @property
     def form(self):
@@ -318,7 +415,7 @@ class Key:
         return f"Key({self.form}, {len(self.questions)} questions)"
 
 
-@dataclass
+@dataclass(slots=True)
 class ScantronGrade:
     student: Student
     form: Bubble
@@ -333,30 +430,30 @@ class ScantronGrade:
 
 
 class Grader:
-    _keys: List[Key] = []
+    __slots__ = ('_key_by_form',)
 
-    def __init__(self, keys: List[Key]):
-        def add_key(self, key: Key):
-            assert key.form not in [k.form for k in self.keys], \
-                f"Cannot have multiple keys for form {key.form}"
-            self._keys.append(key)
+    _key_by_form: Dict[Bubble, Key]
 
+    def __init__(self, keys: List[Key]):
+        self._key_by_form = {}
         for key in keys:
-            add_key(self, key)
+            assert key.form not in self._key_by_form, \
+                f"Cannot have multiple keys for form {key.form}"
+            self._key_by_form[key.form] = key
 
     @property
     def keys(self):
-        return self._keys
+        return list(self._key_by_form.values())
 
     def _find_key(self, form: Bubble) -> Key:
-        for key in self.keys:
-            if key.form == form:
-                return key
-        assert False, f"Key for form {form} not found"
-
-    def grade(self, scantron: Scantron) -> ScantronGrade:
-        """Grades a scantron with the key matching their form"""
-        points, out_of = self._find_key(scantron.form).grade(scantron)
+        key = self._key_by_form.get(form)
+        assert key is not None, f"Key for form {form} not found"
+        return key
+
+    @staticmethod
+    def _grade_with(key: Key, scantron: Scantron) -> ScantronGrade:
+        key._check_num_responses(scantron.responses)
+        points, out_of = key._grade_unchecked(scantron.responses)
         return ScantronGrade(
             student=scantron.student,
             form=scantron.form,
@@ -364,5 +461,19 @@ class Grader:
             out_of=out_of
         )
 
+    def grade(self, scantron: Scantron) -> ScantronGrade:
+        """Grades a scantron with the key matching their form"""
+        return self._grade_with(self._find_key(scantron.form), scantron)
+
     def grade_all(self, scantrons: List[Scantron]) -> List[ScantronGrade]:
-        return [self.grade(scantron) for scantron in scantrons]
+        """Grades scantrons in batches by form, keeping their order"""
+        buckets: Dict[Bubble, List[int]] = {}
+        for i, scantron in enumerate(scantrons):
+            buckets.setdefault(scantron.form, []).append(i)
+
+        grades: List[ScantronGrade] = [None] * len(scantrons)
+        for form, indices in buckets.items():
+            key = self._find_key(form)
+            for i in indices:
+                grades[i] = self._grade_with(key, scantrons[i])
+        return grades